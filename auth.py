@@ -1,11 +1,41 @@
 import os
+import re
 import random
-import configparser
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import click
 import dropbox
 from dropbox.oauth import DropboxOAuth2FlowNoRedirect
 
 APP_CREATE_URL = "https://www.dropbox.com/developers/apps"
 CONFIG_FILE = "config.ini"
+# Refresh the access token once it is this close to expiring
+TOKEN_REFRESH_SLACK = timedelta(minutes=5)
+# Keep-alive connections pooled for concurrent uploads
+MAX_CONNECTIONS = 16
+
+# One client (and connection pool) per process
+_DBX_SINGLETON = None
+_DBX_LOCK = threading.Lock()
+
+# Parsed [Dropbox] sections keyed by (path, mtime) so repeat reads skip parsing
+_CONFIG_CACHE = {}
+# config.ini is parsed by hand. Options may use "=" or ":" like ConfigParser,
+# but only [ \t] may pad values: \s would swallow newlines and steal the next line
+_SECTION_RE = re.compile(r"^\[([^\]\n]+)\][ \t]*$", re.M)
+_OPTION_RE = re.compile(r"^(\w+)[ \t]*[=:][ \t]*(.*?)[ \t]*$", re.M)
+
+# Every option we ever write to the [Dropbox] section, in file order
+CONFIG_KEYS = (
+    "AppKey",
+    "AppSecret",
+    "AccessCode",
+    "AccessToken",
+    "RefreshToken",
+    "ExpiresAt",
+    "ExpirationTime",
+)
 
 
 def update_config_with_tokens(oauth_result, config_file=CONFIG_FILE):
@@ -14,34 +44,28 @@ def update_config_with_tokens(oauth_result, config_file=CONFIG_FILE):
     refresh_token = oauth_result.refresh_token
     expires_at = oauth_result.expires_at
 
-    config = configparser.ConfigParser()
-
     # Read the existing config file
     try:
-        config.read(config_file)
+        options = dict(read_config_section(config_file) or {})
     except Exception as e:
         print(f"Failed to read configuration file {config_file}: {e}")
         return
 
-    if "Dropbox" not in config:
-        config["Dropbox"] = {}
-
     # Update the 'Dropbox' section with new tokens
     if access_token:
         print("Access token:", access_token)
-        config["Dropbox"]["AccessToken"] = access_token
+        options["accesstoken"] = access_token
     if refresh_token:
         print("Refresh token:", refresh_token)
-        config["Dropbox"]["RefreshToken"] = refresh_token
+        options["refreshtoken"] = refresh_token
     if expires_at:
         print("Expires at:", expires_at)
-        config["Dropbox"]["ExpiresAt"] = str(expires_at)
-        config["Dropbox"]["ExpirationTime"] = expires_at.isoformat()
+        options["expiresat"] = str(expires_at)
+        options["expirationtime"] = expires_at.isoformat()
 
     # Write the updated configuration back to the file
     try:
-        with open(config_file, "w") as configfile:
-            config.write(configfile)
+        write_config(options, config_file)
         print(f"Configuration updated with tokens in {config_file}")
     except Exception as e:
         print(f"Failed to write configuration to {config_file}: {e}")
@@ -80,57 +104,141 @@ def get_and_store_refresh_token(app_key):
     return oauth_result.refresh_token
 
 
+def validate_min_length(value):
+    value = value.strip()
+    if len(value) < 5:
+        raise click.BadParameter(
+            "Input must be at least 5 characters long. Please try again."
+        )
+    return value
+
+
 def prompt(message):
-    response = input(f"\n{message}").strip()
-    while len(response) < 5:
-        print("Input must be at least 5 characters long. Please try again.")
-        response = input(f"{message}").strip()
-    return response
+    return click.prompt(
+        f"\n{message}", prompt_suffix="", value_proc=validate_min_length
+    )
 
 
 def write_to_config(app_key, app_secret, access_code=None, config_file=CONFIG_FILE):
-    config = configparser.ConfigParser()
-    if access_code:
-
-        config["Dropbox"] = {
-            "AppKey": app_key,
-            "AppSecret": app_secret,
-            "AccessCode": access_code,
-        }
-    else:
-        config["Dropbox"] = {
-            "AppKey": app_key,
-            "AppSecret": app_secret,
-        }
-
-    with open(config_file, "w") as configfile:
-        config.write(configfile)
+    options = {"appkey": app_key, "appsecret": app_secret, "accesscode": access_code}
+    write_config(options, config_file)
     print(f"Configuration written to {config_file}")
 
 
-def read_from_config(config_file=CONFIG_FILE):
-    config = configparser.ConfigParser()
+def parse_dropbox_section(text):
+    """Return the [Dropbox] options of an INI string, keyed by lowercased name."""
+    # split() yields [preamble, name1, body1, name2, body2, ...]
+    sections = _SECTION_RE.split(text)
+    for name, body in zip(sections[1::2], sections[2::2]):
+        if name.strip() == "Dropbox":
+            return {key.lower(): value for key, value in _OPTION_RE.findall(body)}
+    return None
+
+
+def render_config(options):
+    """Render a [Dropbox] section from options keyed by lowercased name."""
+    lines = "".join(
+        f"{key} = {options[key.lower()]}\n"
+        for key in CONFIG_KEYS
+        if options.get(key.lower())
+    )
+    return f"[Dropbox]\n{lines}\n"
+
+
+def write_config(options, config_file=CONFIG_FILE):
+    # Write to a sibling temp file and swap it in, so a crash never leaves a
+    # half-written config behind
+    directory = os.path.dirname(os.path.abspath(config_file))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".config-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(render_config(options))
+        os.replace(tmp_path, config_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    invalidate_config_cache(config_file)
+
+
+def invalidate_config_cache(config_file=CONFIG_FILE):
+    for key in [key for key in _CONFIG_CACHE if key[0] == config_file]:
+        del _CONFIG_CACHE[key]
 
+
+def read_config_section(config_file=CONFIG_FILE):
+    """Return the [Dropbox] section of config_file, re-parsing only when it changes."""
+    try:
+        key = (config_file, os.stat(config_file).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+    if key not in _CONFIG_CACHE:
+        with open(config_file, "r") as f:
+            section = parse_dropbox_section(f.read())
+        invalidate_config_cache(config_file)
+        _CONFIG_CACHE[key] = section
+    return _CONFIG_CACHE[key]
+
+
+def read_from_config(config_file=CONFIG_FILE):
     try:
-        config.read(config_file)
+        section = read_config_section(config_file)
     except Exception as e:
         print(f"Failed to read configuration file {config_file}: {e}")
         return None
 
-    if "Dropbox" in config:
-        app_key = config.get("Dropbox", "appkey", fallback=None)
-        refresh_token = config.get("Dropbox", "refreshtoken", fallback=None)
+    if section is not None:
+        app_key = section.get("appkey")
+        refresh_token = section.get("refreshtoken")
         return app_key, refresh_token
 
 
-def refresh_access_token_if_needed(dbx):
+def read_cached_access_token(config_file=CONFIG_FILE):
+    """Return the stored (access_token, expires_at), or (None, None) if unusable."""
+    section = read_config_section(config_file) or {}
+    access_token = section.get("accesstoken")
+    try:
+        expires_at = datetime.fromisoformat(section.get("expiresat", ""))
+    except ValueError:
+        return None, None
+    return access_token, expires_at
+
+
+def refresh_access_token_if_needed(dbx, config_file=CONFIG_FILE):
+    access_token, expires_at = read_cached_access_token(config_file)
+    # Dropbox token expirations are naive UTC datetimes
+    if access_token and expires_at - datetime.utcnow() > TOKEN_REFRESH_SLACK:
+        return
+
     try:
         dbx.check_and_refresh_access_token()
     except dropbox.exceptions.AuthError as err:
         print("Error refreshing access token:", err)
+        return
+
+    # The SDK keeps the refreshed token privately; persist it so the next run
+    # can skip the refresh round trip
+    options = dict(read_config_section(config_file) or {})
+    options["accesstoken"] = dbx._oauth2_access_token
+    if dbx._oauth2_access_token_expiration:
+        options["expiresat"] = str(dbx._oauth2_access_token_expiration)
+        options["expirationtime"] = dbx._oauth2_access_token_expiration.isoformat()
+    try:
+        write_config(options, config_file)
+    except Exception as e:
+        print(f"Failed to write configuration to {config_file}: {e}")
 
 
 def auth():
+    """Return the process-wide Dropbox client, creating it on first use."""
+    global _DBX_SINGLETON
+    with _DBX_LOCK:
+        if _DBX_SINGLETON is None:
+            _DBX_SINGLETON = create_dropbox_client()
+        return _DBX_SINGLETON
+
+
+def create_dropbox_client():
     if not os.path.exists(CONFIG_FILE) or os.path.getsize(CONFIG_FILE) == 0:
         print(
             "\n This is the first time you run this script, please follow the instructions:\n"
@@ -166,7 +274,14 @@ def auth():
     if app_key and refresh_token:
         print("\nConfiguration loaded from file:")
         print(f" > App key: {app_key}")
-        dbx = dropbox.Dropbox(oauth2_refresh_token=refresh_token, app_key=app_key)
+        access_token, expires_at = read_cached_access_token()
+        dbx = dropbox.Dropbox(
+            oauth2_access_token=access_token,
+            oauth2_access_token_expiration=expires_at,
+            oauth2_refresh_token=refresh_token,
+            app_key=app_key,
+            session=dropbox.create_session(max_connections=MAX_CONNECTIONS),
+        )
         refresh_access_token_if_needed(dbx)
         return dbx
     else:
@@ -6,19 +6,35 @@ Copied and modified from https://github.com/dropbox/dropbox-sdk-python/blob/main
 """
 
 import os
+import posixpath
 import json
+import hashlib
 import sys
+import queue
+import contextlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import dropbox
 from dropbox.files import WriteMode
-from dropbox.exceptions import ApiError
+from dropbox.exceptions import ApiError, DropboxException
+from dropbox import stone_serializers
 import click
 
 from constants import BACKUP_DIR
-from auth import auth
+from auth import auth, read_from_config
 
-MAX_FILE_SIZE = 150
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB chunk size
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB chunk size
+HASH_BLOCK_SIZE = 4 * 1024 * 1024  # Dropbox content_hash block size
+MAX_WORKERS = 8
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
 CONFIG_FILE = "config.ini"
+LISTING_CACHE_FILE = os.path.expanduser("~/.cache/dropbox-uploader/listing.json")
+
+# Serializes console output from concurrent uploads
+echo_lock = threading.Lock()
 
 
 def load_file_paths(config_path, home_path):
@@ -33,31 +49,53 @@ def load_file_paths(config_path, home_path):
     return file_paths
 
 
-def get_dropbox_path(local_file, backup_filename, verbose=True):
-    backup_path = os.path.join(BACKUP_DIR, backup_filename)
-    if verbose:
-        click.echo(f"Uploading {local_file} to Dropbox as {backup_path}...")
-    return backup_path
+def get_dropbox_path(backup_filename):
+    # Dropbox paths are always POSIX, whatever the local OS
+    return posixpath.join(BACKUP_DIR, backup_filename)
 
 
-def backup(dbx, local_file, backup_filename):
-    file_size = os.path.getsize(local_file)  # Get the file size
-    file_size_mb = file_size / (1024 * 1024)
+def dropbox_content_hash(local_file):
+    """Compute the Dropbox content_hash of a local file.
 
-    if file_size_mb > MAX_FILE_SIZE:
-        print(
-            f"INFO: File exceeds max size of {MAX_FILE_SIZE} MB: {local_file} (Size: {file_size_mb:.2f} MB)"
-        )
-        upload_large_files(dbx, local_file, backup_filename, file_size)
+    See https://www.dropbox.com/developers/reference/content-hash
+    """
+    block_hashes = hashlib.sha256()
+    # Reuse one buffer for every block; hashlib reads memoryviews without copying
+    buf = memoryview(bytearray(HASH_BLOCK_SIZE))
+    with open(local_file, "rb") as f:
+        while n := f.readinto(buf):
+            block_hashes.update(hashlib.sha256(buf[:n]).digest())
+    return block_hashes.hexdigest()
+
+
+def is_backed_up(dbx, local_file, file_size, backup_path):
+    """Check whether Dropbox already holds an identical copy of local_file."""
+    try:
+        metadata = dbx.files_get_metadata(backup_path)
+    except ApiError:
+        # Missing or unreadable remote copy; let the upload sort it out
+        return False
+
+    return (
+        isinstance(metadata, dropbox.files.FileMetadata)
+        and metadata.size == file_size
+        and metadata.content_hash == dropbox_content_hash(local_file)
+    )
+
+
+def backup(dbx, local_file, backup_path):
+    file_size = os.path.getsize(local_file)  # Get the file size
+    if is_backed_up(dbx, local_file, file_size, backup_path):
+        with echo_lock:
+            click.echo(f"Skipping {local_file}; {backup_path} is already up to date.")
         return
 
-    with open(local_file, "rb") as f:
-        backup_path = get_dropbox_path(local_file, backup_filename)
+    with echo_lock:
+        click.echo(f"Uploading {local_file} to Dropbox as {backup_path}...")
 
+    with open(local_file, "rb") as f:
         try:
-            # We use WriteMode=overwrite to make sure that the settings in the file
-            # are changed on upload
-            dbx.files_upload(f.read(), backup_path, mode=WriteMode("overwrite"))
+            upload_streaming(dbx, f, file_size, backup_path)
         except ApiError as err:
             if (
                 err.error.is_path()
@@ -65,55 +103,90 @@ def backup(dbx, local_file, backup_filename):
             ):
                 sys.exit("ERROR: Cannot back up; insufficient space.")
             elif err.user_message_text:
-                print(err.user_message_text)
+                with echo_lock:
+                    print(err.user_message_text)
                 sys.exit()
             else:
-                print(err)
+                with echo_lock:
+                    print(err)
                 sys.exit()
 
 
-def upload_large_files(dbx, local_file, backup_filename, file_size):
-    CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB chunk size
+def upload_streaming(dbx, f, file_size, backup_path):
+    """Upload an open file to Dropbox, reading at most CHUNK_SIZE bytes at a time."""
+    # We use WriteMode=overwrite to make sure that the settings in the file
+    # are changed on upload
+    mode = WriteMode("overwrite")
 
-    # Get the backup path for the file
-    backup_path = get_dropbox_path(local_file, backup_filename)
+    if file_size <= CHUNK_SIZE:
+        # The SDK only accepts bytes, so the best we can do is one exact-size
+        # read; f.read(CHUNK_SIZE) would allocate a full chunk for a tiny file
+        dbx.files_upload(f.read(file_size), backup_path, mode=mode)
+        return
 
-    with open(local_file, "rb") as f:
-        try:
-            # Start upload session
-            upload_sesh_start = dbx.files_upload_session_start(f.read(CHUNK_SIZE))
-            cursor = dropbox.files.UploadSessionCursor(
-                session_id=upload_sesh_start.session_id, offset=f.tell()
-            )
-            commit = dropbox.files.CommitInfo(path=backup_path)
+    with contextlib.closing(prefetch_chunks(f)) as chunks:
+        # Start upload session
+        chunk = next(chunks, b"")
+        upload_sesh_start = dbx.files_upload_session_start(chunk)
+        cursor = dropbox.files.UploadSessionCursor(
+            session_id=upload_sesh_start.session_id, offset=len(chunk)
+        )
+        commit = dropbox.files.CommitInfo(path=backup_path, mode=mode)
+
+        # Upload chunks
+        for chunk in chunks:
+            if cursor.offset + len(chunk) >= file_size:
+                dbx.files_upload_session_finish(chunk, cursor, commit)
+                break
+            dbx.files_upload_session_append_v2(chunk, cursor)
+            cursor.offset += len(chunk)
+        else:
+            # The file shrank while we were reading it
+            dbx.files_upload_session_finish(b"", cursor, commit)
 
-            # Upload chunks
-            while f.tell() < file_size:
-                if (file_size - f.tell()) <= CHUNK_SIZE:
-                    dbx.files_upload_session_finish(f.read(CHUNK_SIZE), cursor, commit)
-                    break
-                else:
-                    dbx.files_upload_session_append_v2(f.read(CHUNK_SIZE), cursor)
-                    cursor.offset = f.tell()
 
-        except ApiError as err:
-            if (
-                err.error.is_path()
-                and err.error.get_path().reason.is_insufficient_space()
-            ):
-                sys.exit("ERROR: Cannot back up; insufficient space.")
-            elif err.user_message_text:
-                print(err.user_message_text)
-            else:
-                print(f"API error: {err}")
+def prefetch_chunks(f, chunk_size=CHUNK_SIZE):
+    """Yield chunks of f, reading ahead from disk while the caller uploads."""
+    chunks = queue.Queue(maxsize=1)
+    stop = threading.Event()
 
+    def reader():
+        try:
+            while not stop.is_set():
+                chunk = f.read(chunk_size)
+                chunks.put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            chunks.put(e)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        # Unblock the reader if we stopped consuming early
+        stop.set()
+        try:
+            chunks.get_nowait()
+        except queue.Empty:
+            pass
+        thread.join()
 
-def restore(dbx, local_file, backup_path, rev=None, verbose=True):
-    if verbose:
-        click.echo(f"Restoring {backup_path} to revision {rev} on Dropbox...")
 
-    # Restore the file to the specified revision
-    dbx.files_restore(backup_path, rev)
+def restore(dbx, local_file, backup_path, rev=None, verbose=True, promote=False):
+    if promote:
+        if verbose:
+            click.echo(f"Restoring {backup_path} to revision {rev} on Dropbox...")
+
+        # Make the specified revision the current version on Dropbox
+        dbx.files_restore(backup_path, rev)
 
     # Check if the local file exists and ask the user for confirmation
     if os.path.exists(local_file):
@@ -130,26 +203,42 @@ def restore(dbx, local_file, backup_path, rev=None, verbose=True):
             # Rename the file using its revision
             local_file = f"{local_file}_rev_{rev}"
 
-    # Download the current version of the file from Dropbox
+    # Download the requested revision straight from Dropbox; no restore needed
     click.echo(
-        f"Downloading current version of {backup_path} from Dropbox, saving as {local_file}..."
+        f"Downloading revision {rev} of {backup_path} from Dropbox, saving as {local_file}..."
     )
-    with open(local_file, "wb") as f:
-        metadata, res = dbx.files_download(path=backup_path)
-        f.write(res.content)
+    metadata, res = dbx.files_download(path=backup_path, rev=rev)
+    # Write the response through in chunks rather than buffering the whole file
+    with res, open(local_file, "wb") as f:
+        for chunk in res.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            f.write(chunk)
 
     if verbose:
         click.secho(f"Restored {local_file}", fg="green")
 
 
 def check_files_exist(files):
+    # Scan each directory once instead of stat()ing every file
+    files_by_dir = defaultdict(list)
     for file in files:
-        if not os.path.exists(file):
-            raise FileNotFoundError(f"File not found: {file}")
+        files_by_dir[os.path.dirname(file)].append(file)
 
+    for directory, dir_files in files_by_dir.items():
+        try:
+            with os.scandir(directory or ".") as it:
+                # Symlinks may dangle, so leave those to os.path.exists
+                names = {entry.name for entry in it if not entry.is_symlink()}
+        except OSError:
+            names = set()
 
-def format_datetime(dt):
-    current_year = datetime.now().year
+        for file in dir_files:
+            if os.path.basename(file) not in names and not os.path.exists(file):
+                raise FileNotFoundError(f"File not found: {file}")
+
+
+def format_datetime(dt, current_year=None):
+    if current_year is None:
+        current_year = datetime.now().year
     if dt.year == current_year:
         return dt.strftime("%b %d %H:%M")
     else:
@@ -160,7 +249,14 @@ def format_datetime(dt):
 @click.pass_context
 def cli(ctx):
     ctx.ensure_object(dict)
-    ctx.obj["dbx"] = auth()
+    ctx.obj["dbx_factory"] = auth
+
+
+def get_dbx(ctx):
+    """Authenticate on first use, so --help and completion never touch Dropbox."""
+    if "dbx" not in ctx.obj:
+        ctx.obj["dbx"] = ctx.obj["dbx_factory"]()
+    return ctx.obj["dbx"]
 
 
 @click.command()
@@ -174,9 +270,23 @@ def backup_files(ctx):
     file_paths = load_file_paths("file_paths.json", home_path)
 
     check_files_exist(file_paths.values())
-    dbx = ctx.obj["dbx"]
-    for filename, full_path in file_paths.items():
-        backup(dbx, full_path, filename)
+    dropbox_paths = {filename: get_dropbox_path(filename) for filename in file_paths}
+    dbx = get_dbx(ctx)
+    # Uploads are network-bound, so overlap them across a small thread pool
+    max_workers = max(1, min(MAX_WORKERS, len(file_paths)))
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = [
+            ex.submit(backup, dbx, full_path, dropbox_paths[filename])
+            for filename, full_path in file_paths.items()
+        ]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except BaseException:
+                # backup() exits on API errors; stop queued uploads like the
+                # serial loop did instead of running every remaining file
+                ex.shutdown(cancel_futures=True)
+                raise
 
     click.secho("All files backed up successfully.", fg="green")
 
@@ -192,33 +302,124 @@ def backup_files(ctx):
 def backup_file(ctx, file_path):
     """Backup a user-specified file."""
 
-    dbx = ctx.obj["dbx"]
+    dbx = get_dbx(ctx)
     filename = os.path.basename(file_path)
-    backup(dbx, file_path, filename)
+    backup(dbx, file_path, get_dropbox_path(filename))
     click.secho(f"File {file_path} backed up successfully.", fg="green")
 
 
 def human_readable_size(size):
-    for unit in ["B", "KB", "MB", "GB"]:
-        if size < 1024:
-            return f"{size:.1f} {unit}"
-        size /= 1024
-    return f"{size:.2f} GB"  # In case the size is extremely large
+    # Each unit is 2**10 times the last, so the bit length picks the unit
+    shift = min((size.bit_length() - 1) // 10, len(SIZE_UNITS) - 1) if size else 0
+    return f"{size / (1 << (shift * 10)):.1f} {SIZE_UNITS[shift]}"
+
+
+def listing_cache_key(app_key, folder):
+    # config.ini is per directory, so one machine may list folders of several
+    # apps; a cursor is only valid for the app that created it
+    return f"{app_key}:{folder}"
+
+
+def read_listing_cache():
+    try:
+        with open(LISTING_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_listing_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(LISTING_CACHE_FILE), exist_ok=True)
+        tmp_path = f"{LISTING_CACHE_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, LISTING_CACHE_FILE)
+    except OSError as e:
+        print(f"Failed to write listing cache {LISTING_CACHE_FILE}: {e}")
+
+
+def load_listing_cache(key):
+    """Return the cached (cursor, entries) for key, or (None, []) if missing."""
+    try:
+        cached = read_listing_cache()[key]
+        entries = [
+            stone_serializers.json_compat_obj_decode(
+                dropbox.files.Metadata_validator, entry
+            )
+            for entry in cached["entries"]
+        ]
+        return cached["cursor"], entries
+    except Exception:
+        return None, []
+
+
+def save_listing_cache(key, cursor, entries):
+    cache = read_listing_cache()
+    cache[key] = {
+        "cursor": cursor,
+        "entries": [
+            stone_serializers.json_compat_obj_encode(
+                dropbox.files.Metadata_validator, entry
+            )
+            for entry in entries
+        ],
+    }
+    write_listing_cache(cache)
+
+
+def drop_listing_cache(key):
+    cache = read_listing_cache()
+    if cache.pop(key, None) is not None:
+        write_listing_cache(cache)
+
+
+def fetch_folder_entries(dbx, folder, app_key):
+    """Return every entry in folder, fetching only the changes since the last call."""
+    key = listing_cache_key(app_key, folder)
+    cursor, cached_entries = load_listing_cache(key)
+    entries = {entry.path_lower: entry for entry in cached_entries}
+
+    result = None
+    if cursor:
+        try:
+            result = dbx.files_list_folder_continue(cursor)
+        except DropboxException:
+            # Expired, rejected or malformed cursor; forget it and start over
+            drop_listing_cache(key)
+    if result is None:
+        entries = {}
+        result = dbx.files_list_folder(folder)
 
+    while True:
+        for entry in result.entries:
+            if isinstance(entry, dropbox.files.DeletedMetadata):
+                entries.pop(entry.path_lower, None)
+            else:
+                entries[entry.path_lower] = entry
+        if not result.has_more:
+            break
+        result = dbx.files_list_folder_continue(result.cursor)
+
+    save_listing_cache(key, result.cursor, entries.values())
+    return list(entries.values())
 
-def list_files_in_dropbox(dbx):
+
+def list_files_in_dropbox(dbx, app_key):
     """List files in Dropbox."""
-    backups = dbx.files_list_folder(BACKUP_DIR)
+    backups = fetch_folder_entries(dbx, BACKUP_DIR, app_key)
 
-    if not backups.entries:
+    if not backups:
         print("No files found in Dropbox.")
         return []
 
     file_list = []
+    current_year = datetime.now().year
     print("Files in Dropbox:")
-    for i, entry in enumerate(backups.entries):
+    for i, entry in enumerate(backups):
         human_size = human_readable_size(entry.size)
-        file_info = f"{i + 1}: {human_size} {format_datetime(entry.server_modified)} {entry.name}"
+        modified = format_datetime(entry.server_modified, current_year)
+        file_info = f"{i + 1}: {human_size} {modified} {entry.name}"
         print(file_info)
         file_list.append(entry)
 
@@ -229,25 +430,27 @@ def list_files_in_dropbox(dbx):
 @click.pass_context
 def list_files(ctx):
     """List files in Dropbox."""
-    dbx = ctx.obj["dbx"]
-    list_files_in_dropbox(dbx)
+    dbx = get_dbx(ctx)
+    app_key, _ = read_from_config()
+    list_files_in_dropbox(dbx, app_key)
 
 
 def help_select_revision(dbx, backup_path):
-    """List the revisions for a specific file (and sort by the datetime object, "server_modified") and select one."""
+    """List the revisions for a specific file (oldest first) and select one."""
     revisions = dbx.files_list_revisions(backup_path, limit=30).entries
     if not revisions:
         print(f"No revisions found for {backup_path}.")
         return None
 
-    sorted_revisions = sorted(revisions, key=lambda revision: revision.server_modified)
+    # Dropbox returns revisions newest first, so flipping them is enough
+    revisions.reverse()
 
+    current_year = datetime.now().year
     print(f"Revisions for {backup_path}:")
-    for i, rev in enumerate(sorted_revisions):
+    for i, rev in enumerate(revisions):
         human_size = human_readable_size(rev.size)
-        file_revision_info = (
-            f"{i + 1}: {human_size} {format_datetime(rev.server_modified)} {rev.rev}"
-        )
+        modified = format_datetime(rev.server_modified, current_year)
+        file_revision_info = f"{i + 1}: {human_size} {modified} {rev.rev}"
         print(file_revision_info)
 
     while True:
@@ -256,7 +459,7 @@ def help_select_revision(dbx, backup_path):
         )
 
         if 1 <= selected_index <= len(revisions):
-            return sorted_revisions[selected_index - 1].rev
+            return revisions[selected_index - 1].rev
         else:
             if selected_index == 0:
                 return None
@@ -267,8 +470,9 @@ def help_select_revision(dbx, backup_path):
 @click.pass_context
 def select_revision(ctx):
     """List files in Dropbox and select a file to see revisions."""
-    dbx = ctx.obj["dbx"]
-    file_list = list_files_in_dropbox(dbx)
+    dbx = get_dbx(ctx)
+    app_key, _ = read_from_config()
+    file_list = list_files_in_dropbox(dbx, app_key)
 
     if not file_list:
         return
@@ -305,13 +509,18 @@ def select_revision(ctx):
     "-p",
     help="The path of the file in Dropbox to be restored.",
 )
+@click.option(
+    "--promote",
+    is_flag=True,
+    help="Also make the revision the current version of the file in Dropbox.",
+)
 @click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
 @click.pass_context
-def restore_file(ctx, file_path, revision, dropbox_path, verbose):
+def restore_file(ctx, file_path, revision, dropbox_path, promote, verbose):
     """Restore a user-selected file and revision from Dropbox."""
-    dbx = ctx.obj["dbx"]
+    dbx = get_dbx(ctx)
     filename = os.path.basename(file_path)
-    dropbox_path = get_dropbox_path(file_path, filename, verbose)
+    dropbox_path = dropbox_path or get_dropbox_path(filename)
 
     if not revision:
         revision = help_select_revision(dbx, dropbox_path)
@@ -335,7 +544,7 @@ def restore_file(ctx, file_path, revision, dropbox_path, verbose):
                 return
 
     try:
-        restore(dbx, file_path, dropbox_path, revision, verbose)
+        restore(dbx, file_path, dropbox_path, revision, verbose, promote)
         click.secho(
             f"File {file_path} restored to revision {revision} successfully.",
             fg="green",